@@ -0,0 +1,45 @@
+"""
+OpenStreamKit JSON backend (learning-first)
+
+One place that decides which JSON library the project uses:
+orjson (fastest) → ujson → stdlib json (always available).
+
+The rest of the code only calls fastjson.loads / fastjson.dumps,
+so it doesn't care which backend is installed.
+"""
+
+# ===================================================================== IMPORTS =====================================================================
+try:
+    import orjson as _json
+except ImportError:
+    try:
+        import ujson as _json
+    except ImportError:
+        import json as _json
+
+# ===================================================================== CONFIG / CONSTANTS =====================================================================
+# Name of the backend that won ("orjson", "ujson" or "json")
+BACKEND = _json.__name__
+
+# ===================================================================== HELPER FUNCTIONS =====================================================================
+# loads accepts bytes or str with every backend
+loads = _json.loads
+
+# dumps always returns UTF-8 bytes (orjson's native output), so callers can write it straight to disk
+if BACKEND == "orjson":
+    def dumps(data, indent: bool = False) -> bytes:
+        if indent:
+            return _json.dumps(data, option=_json.OPT_INDENT_2)
+        return _json.dumps(data)
+
+elif BACKEND == "ujson":
+    def dumps(data, indent: bool = False) -> bytes:
+        return _json.dumps(
+            data, indent=2 if indent else 0, ensure_ascii=False, escape_forward_slashes=False
+        ).encode("utf-8")
+
+else:
+    def dumps(data, indent: bool = False) -> bytes:
+        if indent:
+            return _json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+        return _json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
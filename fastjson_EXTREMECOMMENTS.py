@@ -0,0 +1,94 @@
+"""
+OpenStreamKit JSON backend (learning-first)
+
+One place that decides which JSON library the project uses:
+orjson (fastest) → ujson → stdlib json (always available).
+
+The rest of the code only calls fastjson.loads / fastjson.dumps,
+so it doesn't care which backend is installed.
+
+===============================================================================
+TEACHING TWIN NOTE (EXTREMECOMMENTS MODE)
+===============================================================================
+This file is the “director’s commentary” track for fastjson.py.
+
+RULES:
+- The executable behavior should match the non-teaching version.
+- Only comments, whitespace, and explanations should differ.
+- If the code behaves differently than the non-teaching twin, treat that as a bug.
+"""
+# ===================================================================== IMPORTS =====================================================================
+# This is the "import ladder" pattern:
+#
+#   try the best option
+#     -> if it isn't installed (ImportError), try the next best
+#       -> finally fall back to something that always exists
+#
+# Why not just require orjson?
+# - orjson ships prebuilt wheels for most platforms, but not all.
+# - A missing optional speed-up should make the app slower, not crash it.
+#
+# Why this order?
+# - orjson: Rust, SIMD-accelerated, usually the fastest by a wide margin
+# - ujson:  C extension, typically 2–3× faster than stdlib for small dicts
+#           (exactly the size of a Kick webhook: sender, content, message_id...)
+# - json:   stdlib, pure-Python scanner/formatter paths, always installed
+#
+# Whichever import succeeds is bound to the SAME name (_json),
+# so the rest of this file can talk to "_json" without caring which one it is.
+try:
+    import orjson as _json
+except ImportError:
+    try:
+        import ujson as _json
+    except ImportError:
+        import json as _json
+
+# ===================================================================== CONFIG / CONSTANTS =====================================================================
+# Name of the backend that won ("orjson", "ujson" or "json").
+# Every module has a __name__ attribute, so this tells us which import succeeded.
+# app.py uses it to pick the matching FastAPI response class.
+BACKEND = _json.__name__
+
+# ===================================================================== HELPER FUNCTIONS =====================================================================
+# loads: JSON text -> Python object.
+# All three libraries accept bytes OR str here, with the same call signature,
+# so we can re-export the backend's function directly (no wrapper = no overhead).
+loads = _json.loads
+
+# dumps: Python object -> JSON.
+#
+# The three libraries DON'T agree on dumps:
+# - orjson returns bytes and uses option=... flags
+# - ujson/json return str and use keyword arguments
+#
+# So we define ONE dumps(...) with the same contract for every backend:
+# - it always returns UTF-8 bytes (orjson's native output),
+#   so callers can write it straight to a file opened in "wb" mode
+# - indent=True means "pretty-print with 2 spaces" (nice for humans reading json/)
+#
+# The if/elif/else runs ONCE, at import time, so there is no
+# "which backend am I?" check on every call.
+if BACKEND == "orjson":
+    def dumps(data, indent: bool = False) -> bytes:
+        if indent:
+            # OPT_INDENT_2 = pretty-print with 2 spaces
+            return _json.dumps(data, option=_json.OPT_INDENT_2)
+        # No options = compact output (no spaces at all)
+        return _json.dumps(data)
+
+elif BACKEND == "ujson":
+    def dumps(data, indent: bool = False) -> bytes:
+        # ensure_ascii=False            -> keep emoji/non-English chat as real UTF-8 (like orjson)
+        # escape_forward_slashes=False  -> write "https://..." instead of "https:\/\/..." (like orjson)
+        return _json.dumps(
+            data, indent=2 if indent else 0, ensure_ascii=False, escape_forward_slashes=False
+        ).encode("utf-8")
+
+else:
+    def dumps(data, indent: bool = False) -> bytes:
+        if indent:
+            return _json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+        # separators=(",", ":") removes the default spaces after , and :
+        # so compact output matches orjson's.
+        return _json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")